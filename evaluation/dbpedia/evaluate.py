@@ -14,6 +14,8 @@ Where
       keys `id`, `category`, and `type`, holding the question ID, predicted
       category, and ranked list of up to 10 types, respectively.
 
+Requirements: `ijson`, used for parsing JSON files incrementally, and `numpy`
+(`pip install ijson numpy`).
 
 The script computes accuracy for category classification and NDCG@k for type
 prediction.
@@ -30,8 +32,34 @@ Author: Krisztian Balog (krisztian.balog@uis.no)
 """
 
 import argparse
-import json
 import math
+import sys
+
+import ijson
+import numpy as np
+
+
+class TypeNode:
+    """A type in the type hierarchy.
+
+    Attributes:
+        parent: Name of the parent type.
+        depth: Depth of the type in the hierarchy.
+        children: List with the names of the child types.
+        path: Tuple with the type's path in the hierarchy (None until computed
+            by get_type_path).
+        ancestor_distances: Dict with the distance of each type on the path
+            from the type (None until computed by get_type_path).
+    """
+
+    __slots__ = ('parent', 'depth', 'children', 'path', 'ancestor_distances')
+
+    def __init__(self, parent, depth):
+        self.parent = parent
+        self.depth = depth
+        self.children = []
+        self.path = None
+        self.ancestor_distances = None
 
 
 def load_type_hierarchy(filename):
@@ -43,7 +71,8 @@ def load_type_hierarchy(filename):
         filename: Name of TSV file.
 
     Returns:
-        A tuple with a types dict and the max hierarchy depth.
+        A tuple with a dict of types (mapping type names to TypeNode objects)
+        and the max hierarchy depth.
     """
     print('Loading type hierarchy from {}... '.format(filename), end='')
     types = {}
@@ -52,27 +81,45 @@ def load_type_hierarchy(filename):
         next(tsv_file)  # Skip header row
         for line in tsv_file:
             fields = line.rstrip().split('\t')
-            type_name, depth, parent_type = fields[0], int(fields[1]), fields[2]
-            types[type_name] = {'parent': parent_type,
-                                'depth': depth}
+            type_name, depth, parent_type = (sys.intern(fields[0]),
+                                             int(fields[1]),
+                                             sys.intern(fields[2]))
+            types[type_name] = TypeNode(parent_type, depth)
             max_depth = max(depth, max_depth)
+    # Indexing the children of each type, so that subtypes can be enumerated
+    # without scanning the entire hierarchy.
+    for type_name, type_node in types.items():
+        if type_node.parent in types:
+            types[type_node.parent].children.append(type_name)
     print('{} types loaded (max depth: {})'.format(len(types), max_depth))
     return types, max_depth
 
 
+def intern_types(types):
+    """Interns type names, so that looking them up in the type hierarchy (and
+    in dicts and sets derived from it) can compare them by identity.
+
+    Values other than a list of types (e.g., null) are returned as is.
+    """
+    if not isinstance(types, list):
+        return types
+    return [sys.intern(type) if isinstance(type, str) else type
+            for type in types]
+
+
 def load_ground_truth(filename, type_hierarchy):
     """Loads the ground truth from a JSON file."""
     print('Loading ground truth from {}... '.format(filename))
     ground_truth = {}
-    with open(filename, 'r') as json_file:
-        data = json.load(json_file)
-        for question in data:
+    with open(filename, 'rb') as json_file:
+        # Questions are parsed one at a time, without loading the entire file.
+        for question in ijson.items(json_file, 'item'):
             if not question['question']:  # Ignoring null questions
                 print('WARNING: question text for ID {} is empty'.format(
                     question['id']))
                 continue
             types = []
-            for type in question['type']:
+            for type in intern_types(question['type']):
                 if question['category'] == 'resource' \
                         and type not in type_hierarchy:
                     print('WARNING: unknown type "{}"'.format(type))
@@ -91,31 +138,59 @@ def load_system_output(filename):
     """Loads the system's predicted output from a JSON file."""
     print('Loading system predictions from {}... '.format(filename))
     system_output = {}
-    with open(filename, 'r') as json_file:
-        data = json.load(json_file)
-        for answer in data:
+    with open(filename, 'rb') as json_file:
+        # Answers are parsed one at a time, without loading the entire file.
+        for answer in ijson.items(json_file, 'item'):
             system_output[answer['id']] = {
                 'category': answer['category'],
-                'type': answer['type']
+                'type': intern_types(answer['type'])
             }
     print('   {} predictions loaded'.format(len(system_output)))
     return system_output
 
 
+# Rank discounts 1/log_2(i+1) for positions i=1..32, precomputed for DCG.
+_LOG2_DISCOUNTS = tuple(1 / math.log2(i + 2) for i in range(32))
+
+# Number of top-ranked types that are evaluated.
+_MAX_RANK = 10
+
+
+def log2_discounts(k):
+    """Gets the rank discounts 1/log_2(i+1) for positions i=1..k (at least).
+
+    The precomputed discounts are used, unless k exceeds their number.
+    """
+    if k <= len(_LOG2_DISCOUNTS):
+        return _LOG2_DISCOUNTS
+    return tuple(1 / math.log2(i + 2) for i in range(k))
+
+
 def dcg(gains, k=5):
     """Computes DCG for a given ranking.
 
     Traditional DCG formula: DCG_k = sum_{i=1}^k gain_i / log_2(i+1).
     """
-    dcg = 0
-    for i in range(0, min(k, len(gains))):
-        dcg += gains[i] / math.log(i + 2, 2)
-    return dcg
+    k = min(k, len(gains))
+    discounts = log2_discounts(k)
+    return sum(gains[i] * discounts[i] for i in range(k))
+
 
+def ndcg(gains, ideal_dcgs, k=5):
+    """Computes NDCG for a batch of rankings given their gains as well as the
+    DCG of the corresponding ideal rankings (at the same cutoff k).
+
+    Args:
+        gains: Array of shape (N, m) with the gains of N rankings (padded with
+            zeros); positions beyond m are considered to have zero gain.
+        ideal_dcgs: Array of shape (N,) with the DCG of the ideal rankings.
+        k: Rank cutoff.
 
-def ndcg(gains, ideal_gains, k=5):
-    """Computes NDCG given gains for a ranking as well as the ideal gains."""
-    return dcg(gains, k) / dcg(ideal_gains, k)
+    Returns:
+        Array of shape (N,) with NDCG values.
+    """
+    k = min(k, gains.shape[1])
+    return (gains[:, :k] @ np.array(log2_discounts(k)[:k])) / ideal_dcgs
 
 
 def get_type_path(type, type_hierarchy):
@@ -123,45 +198,64 @@ def get_type_path(type, type_hierarchy):
     owl:Thing).
 
     The path for each type is computed only once then cached in type_hierarchy,
-    to save computation.
+    to save computation. Paths are cached for all the types along the way too,
+    and the walk up the hierarchy stops at the first type with a cached path.
     """
-    if 'path' not in type_hierarchy[type]:
-        type_path = []
+    if type_hierarchy[type].path is None:
+        uncached_types = []
         current_type = type
-        while current_type in type_hierarchy:
-            type_path.append(current_type)
-            current_type = type_hierarchy[current_type]['parent']
-        type_hierarchy[type]['path'] = type_path
-    return type_hierarchy[type]['path']
+        while current_type in type_hierarchy \
+                and type_hierarchy[current_type].path is None:
+            uncached_types.append(current_type)
+            current_type = type_hierarchy[current_type].parent
+        type_path = tuple(uncached_types)
+        if current_type in type_hierarchy:
+            type_path += type_hierarchy[current_type].path
+        for i, uncached_type in enumerate(uncached_types):
+            type_hierarchy[uncached_type].path = type_path[i:]
+            # Distance of each type on the path from the type at its start.
+            type_hierarchy[uncached_type].ancestor_distances = {
+                ancestor: distance
+                for distance, ancestor in enumerate(type_path[i:])}
+    return type_hierarchy[type].path
+
+
+def get_ancestor_distances(type, type_hierarchy):
+    """Gets a dict with the distance of each type on the type's path (i.e., the
+    type itself and all its super-types) from the type.
+
+    The distances are cached in type_hierarchy along with the type's path.
+    """
+    get_type_path(type, type_hierarchy)
+    return type_hierarchy[type].ancestor_distances
 
 
-def get_type_distance(type1, type2, type_hierarchy):
+def get_type_distance(type1, type2, type_hierarchy,
+                      type2_ancestor_distances=None):
     """Computes the distance between two types in the hierarchy.
 
     Distance is defined to be the number of steps between them in the hierarchy,
     if they lie on the same path (which is 0 if the two types match), and
     infinity otherwise.
+
+    The ancestor distances of type2 may be passed in when comparing many types
+    against the same type2, so that they are looked up only once.
     """
-    type1_path = get_type_path(type1, type_hierarchy)
-    type2_path = get_type_path(type2, type_hierarchy)
-    distance = math.inf
-    if type1 in type2_path:
-        distance = type2_path.index(type1)
-    if type2 in type1_path:
-        distance = min(type1_path.index(type2), distance)
-    return distance
+    if type2_ancestor_distances is None:
+        type2_ancestor_distances = get_ancestor_distances(type2,
+                                                          type_hierarchy)
+    return min(
+        get_ancestor_distances(type1, type_hierarchy).get(type2, math.inf),
+        type2_ancestor_distances.get(type1, math.inf))
 
 
 def get_most_specific_types(types, type_hierarchy):
     """Filters a set of input types to most specific types w.r.t the type
     hierarchy; i.e., super-types are removed."""
-    filtered_types = set(types)
+    supertypes = set()
     for type in types:
-        type_path = get_type_path(type, type_hierarchy)
-        for supertype in type_path[1:]:
-            if supertype in filtered_types:
-                filtered_types.remove(supertype)
-    return filtered_types
+        supertypes.update(get_type_path(type, type_hierarchy)[1:])
+    return set(types) - supertypes
 
 
 def get_expanded_types(types, type_hierarchy):
@@ -171,17 +265,51 @@ def get_expanded_types(types, type_hierarchy):
     for type in types:
         # Adding all supertypes.
         expanded_types.update(get_type_path(type, type_hierarchy))
-        # Adding all subtypes (NOTE: this bit could be done more efficiently).
-        for type2 in type_hierarchy:
-            if type_hierarchy[type2]['depth'] <= type_hierarchy[type]['depth']:
-                continue
-            type2_path = get_type_path(type2, type_hierarchy)
-            if type in type2_path:
-                expanded_types.update(type2_path)
+        # Adding all subtypes by descending the hierarchy from the type.
+        stack = [type]
+        while stack:
+            current_type = stack.pop()
+            expanded_types.add(current_type)
+            stack.extend(type_hierarchy[current_type].children)
     return expanded_types
 
 
-def compute_type_gains(predicted_types, gold_types, type_hierarchy, max_depth):
+def get_gold_type_distances(gold_types, type_hierarchy):
+    """Computes the distance to the closest gold type for all types that lie on
+    the same path with any of the gold types (i.e., the expanded gold types).
+
+    Args:
+        gold_types: List/set of gold types.
+        type_hierarchy: Dict with type hierarchy.
+
+    Returns:
+        Dict with the expanded gold types as keys and their distances to the
+        closest gold type as values.
+    """
+    # Ancestor distances of the gold types are looked up only once, instead of
+    # for every expanded gold type.
+    gold_info = [(gold_type, get_ancestor_distances(gold_type, type_hierarchy))
+                 for gold_type in gold_types]
+    gold_type_distances = {}
+    for type in get_expanded_types(gold_types, type_hierarchy):
+        # Since not all gold types may lie on the same branch, we take the
+        # closest gold type for determining distance.
+        min_distance = math.inf
+        for gold_type, gold_ancestor_distances in gold_info:
+            if type == gold_type:
+                # The distance to a matching gold type can't be beaten.
+                min_distance = 0
+                break
+            min_distance = min(get_type_distance(type, gold_type,
+                                                 type_hierarchy,
+                                                 gold_ancestor_distances),
+                               min_distance)
+        gold_type_distances[type] = min_distance
+    return gold_type_distances
+
+
+def compute_type_gains(predicted_types, gold_types, type_hierarchy, max_depth,
+                       gold_type_distances=None):
     """Computes gains for a ranked list of type predictions.
 
     Following the definition of Linear gain in (Balog and Neumayer, CIKM'12),
@@ -195,22 +323,20 @@ def compute_type_gains(predicted_types, gold_types, type_hierarchy, max_depth):
         gold_types: List/set of gold types (i.e., perfect answers).
         type_hierarchy: Dict with type hierarchy.
         max_depth: Maximum depth of the type hierarchy.
+        gold_type_distances: Dict with distances to the closest gold type, as
+            returned by get_gold_type_distances() (optional; computed from
+            gold_types if not provided).
 
     Returns:
         List with gain values corresponding to each item in predicted_types.
     """
     gains = []
-    expanded_gold_types = get_expanded_types(gold_types, type_hierarchy)
+    if gold_type_distances is None:
+        gold_type_distances = get_gold_type_distances(gold_types,
+                                                      type_hierarchy)
     for predicted_type in predicted_types:
-        if predicted_type in expanded_gold_types:
-            # Since not all gold types may lie on the same branch, we take the
-            # closest gold type for determining distance.
-            min_distance = math.inf
-            for gold_type in gold_types:
-                min_distance = min(get_type_distance(predicted_type, gold_type,
-                                                     type_hierarchy),
-                                   min_distance)
-            gains.append(1 - min_distance / max_depth)
+        if predicted_type in gold_type_distances:
+            gains.append(1 - gold_type_distances[predicted_type] / max_depth)
         else:
             gains.append(0)
     return gains
@@ -226,7 +352,13 @@ def evaluate(system_output, ground_truth, type_hierarchy, max_depth):
         max_depth: Maximum depth of the type hierarchy.
     """
     accuracy = []
-    ndcg_5, ndcg_10 = [], []
+    # Gains of the top-ranked types (padded with zeros) and the ideal DCG@5 and
+    # DCG@10 for each question; NDCG is computed for all of them at the end.
+    type_gains, ideal_dcgs_5, ideal_dcgs_10 = [], [], []
+    # Most specific gold types, distances of the expanded gold types, and the
+    # ideal DCG@5 and DCG@10, keyed by the set of gold types. The same gold
+    # type sets recur across questions, so they are computed only once.
+    gold_types_cache = {}
     for question_id, gold in ground_truth.items():
         if question_id not in system_output:
             print('WARNING: no prediction made for question ID {}'.format(
@@ -234,44 +366,59 @@ def evaluate(system_output, ground_truth, type_hierarchy, max_depth):
             system_output[question_id] = {}
         predicted_category = system_output[question_id].get('category', None)
         predicted_type = system_output[question_id].get('type', [None])
+        # Unless overridden below, the ideal ranking has a single relevant item.
+        ideal_dcg_5 = ideal_dcg_10 = dcg([1])
 
         if predicted_category != gold['category']:
             accuracy.append(0)
             gains = [0]
-            ideal_gains = [1]
         else:
             # Category has been correctly predicted -- proceed to type evaluation.
             accuracy.append(1)
 
             if gold['category'] == 'boolean' and predicted_category == 'boolean':
                 gains = [1]
-                ideal_gains = [1]
             elif len(predicted_type) == 0:
                 gains = [0]
-                ideal_gains = [1]
             elif gold['category'] == 'literal':
                 gains = [1 if gold['type'][0] == predicted_type[0] else 0]
-                ideal_gains = [1]
             elif gold['category'] == 'resource':
                 if len(gold['type']) == 0:
                     print('WARNING: no gold types given for question ID {}'.format(
                         question_id))
                     continue
-                # Filters gold types to most specific ones in the hierarchy.
-                gold_types = get_most_specific_types(gold['type'], type_hierarchy)
+                gold_key = frozenset(gold['type'])
+                if gold_key not in gold_types_cache:
+                    # Filters gold types to most specific ones in the hierarchy.
+                    gold_types = frozenset(
+                        get_most_specific_types(gold_key, type_hierarchy))
+                    gold_type_distances = get_gold_type_distances(
+                        gold_types, type_hierarchy)
+                    ideal_gains = sorted(
+                        compute_type_gains(gold_type_distances, gold_types,
+                                           type_hierarchy, max_depth,
+                                           gold_type_distances), reverse=True)
+                    gold_types_cache[gold_key] = (
+                        gold_types, gold_type_distances,
+                        dcg(ideal_gains, k=5), dcg(ideal_gains, k=10))
+                (gold_types, gold_type_distances, ideal_dcg_5,
+                 ideal_dcg_10) = gold_types_cache[gold_key]
 
                 gains = compute_type_gains(predicted_type, gold_types,
-                                           type_hierarchy, max_depth)
-                ideal_gains = sorted(
-                    compute_type_gains(
-                        get_expanded_types(gold_types, type_hierarchy), gold_types,
-                        type_hierarchy, max_depth), reverse=True)
+                                           type_hierarchy, max_depth,
+                                           gold_type_distances)
 
             else:
                 raise Exception(f"Invalid category: {gold['category']}")
 
-        ndcg_5.append(ndcg(gains, ideal_gains, k=5))
-        ndcg_10.append(ndcg(gains, ideal_gains, k=10))
+        type_gains.append(gains[:_MAX_RANK]
+                          + [0] * (_MAX_RANK - len(gains)))
+        ideal_dcgs_5.append(ideal_dcg_5)
+        ideal_dcgs_10.append(ideal_dcg_10)
+
+    type_gains = np.array(type_gains, dtype=float).reshape(-1, _MAX_RANK)
+    ndcg_5 = ndcg(type_gains, np.array(ideal_dcgs_5), k=5)
+    ndcg_10 = ndcg(type_gains, np.array(ideal_dcgs_10), k=10)
 
     print('\n')
     print('Evaluation results:')
@@ -280,8 +427,8 @@ def evaluate(system_output, ground_truth, type_hierarchy, max_depth):
         len(accuracy)))
     print('  Accuracy: {:5.3f}'.format(sum(accuracy) / len(accuracy)))
     print('Type ranking (based on {} questions)'.format(len(ndcg_5)))
-    print('  NDCG@5:  {:5.3f}'.format(sum(ndcg_5) / len(ndcg_5)))
-    print('  NDCG@10: {:5.3f}'.format(sum(ndcg_10) / len(ndcg_10)))
+    print('  NDCG@5:  {:5.3f}'.format(ndcg_5.mean()))
+    print('  NDCG@10: {:5.3f}'.format(ndcg_10.mean()))
 
 
 def arg_parser():
@@ -1,5 +1,6 @@
 import json
-import pandas as pd
+import ijson
+import orjson
 import codecs
 import datetime
 
@@ -24,29 +25,39 @@ class fc_eval:
             #print(lst_correct)
             #print('pred is')
             #print(lst_pred)
-            for j in range(len(lst_pred)):           
-                if (lst_pred[j]) in str(lst_correct):
-                   #print(lst_pred[j] + ' is present in correct list')
-                   rank = lst_correct.index(lst_pred[j]) + 1
+            #indexing rank of each correct type (first occurrence)
+            correct_index = {}
+            for j in range(len(lst_correct)):
+                correct_index.setdefault(lst_correct[j], j + 1)
+            rank = 0
+            for pred in lst_pred:
+                if pred in correct_index:
+                   #print(pred + ' is present in correct list')
+                   rank = correct_index[pred]
                    break
-                rank = 0            
          else:
             rank = 0
          return rank
 
-     
+     #function for opening a json file in binary mode, skipping the utf-8 byte order mark (if any)
+     def open_json(self, file_path):
+         json_file = open(file_path, 'rb')
+         if json_file.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+            json_file.seek(0)
+         return json_file
 
      #function to evaluate answer types
      def evaluate(self, inp_file_correct, inp_file_pred, out_file_path, results_file):
         json_collection = []
         #opening dummy predictions file
-        with codecs.open(inp_file_pred, 'r', 'utf-8-sig') as data_file: 
-            json_data = json.load(data_file)
-            pred_data_df = pd.DataFrame(json_data)
+        with self.open_json(inp_file_pred) as data_file:
+            json_data = orjson.loads(data_file.read())
         #opening correct lcquad2 ans type file
-        with codecs.open(inp_file_correct, 'r', 'utf-8-sig') as df_correct: 
-             j_data_correct = json.load(df_correct)
-             correct_data_df = pd.DataFrame(j_data_correct)
+        with self.open_json(inp_file_correct) as df_correct:
+             #streaming correct data and indexing it by question id (first occurrence of each id)
+             correct_data = {}
+             for correct in ijson.items(df_correct, 'item'):
+                 correct_data.setdefault(correct['id'], correct)
         cntr_ques_matched = 0
         catg_matched = 0
         rank = 0
@@ -54,27 +65,27 @@ class fc_eval:
         sum_rr = 0
         mrr = 0
         #iterating through the dummy predictions file
-        for i in range(len(pred_data_df['id'])):
+        for pred_data in json_data:
             self.cntr_dummy_ques += 1
-            #creating a reduced data frame out of entire correct data file, which had data of only 1 concerned question in each iteration
-            sel_df = correct_data_df.loc[correct_data_df['id']==pred_data_df['id'][i]]
-            if not(sel_df.empty):
+            #looking up the correct data of the concerned question by its id
+            sel = correct_data.get(pred_data.get('id'))
+            if sel is not None:
                #checking if questions are same in dummy prediction file and correct file
-               if (pred_data_df['id'][i] == list(sel_df['id'])[0]):
+               if (pred_data.get('id') == sel['id']):
                   cntr_ques_matched += 1
                   #print('question matched')
                   #if category does not match, then assigning rank = 0
-                  if (pred_data_df['category'][i] != list(sel_df['category'])[0]):
+                  if (pred_data.get('category') != sel['category']):
                      rank = 0
                   #if category matches
                   else:
                      catg_matched += 1
                      #print('category matched')
-                     if list(sel_df['category'])[0] == 'boolean':
-                        rank = self.fetch_rank_bool(pred_data_df['category'][i], list(sel_df['category'])[0])
-                     elif (list(sel_df['category'])[0] == 'literal' or list(sel_df['category'])[0] == 'resource'):
+                     if sel['category'] == 'boolean':
+                        rank = self.fetch_rank_bool(pred_data['category'], sel['category'])
+                     elif (sel['category'] == 'literal' or sel['category'] == 'resource'):
                         #print('not boolean')
-                        rank = self.fetch_rank_literal_resource(pred_data_df['category'][i], list(sel_df['category'])[0], list(pred_data_df['type'][i]), list(sel_df['type'])[0])
+                        rank = self.fetch_rank_literal_resource(pred_data['category'], sel['category'], list(pred_data.get('type', [])), sel['type'])
                     
             #in case correct ans typ file has no question matching the file with dummy question predictions
             else:
@@ -89,22 +100,22 @@ class fc_eval:
             try:      
                      data = {}
                      try:
-                         data['id'] = int(pred_data_df['id'][i])
+                         data['id'] = int(pred_data['id'])
                      except:
                          data['id'] = ''
                          pass
                      try:
-                         data['question'] = pred_data_df['question'][i]
+                         data['question'] = pred_data['question']
                      except:
                          data['question'] = ''
                          pass
                      try:
-                         data['category'] = pred_data_df['category'][i]
+                         data['category'] = pred_data['category']
                      except:
                          data['category'] = ''
                          pass
                      try:
-                         data['type'] = pred_data_df['type'][i]
+                         data['type'] = pred_data['type']
                      except:
                          data['type'] = ''
                          pass